@@ -273,7 +273,10 @@ def main():
 
 
 if __name__ == "__main__":
-    combined_df = main()
+    from profiling import profile_job, PROFILE_JOBS
+
+    with profile_job("build_gtrends_flu", force=PROFILE_JOBS):
+        combined_df = main()
     print("Done. Final combined DataFrame shape:", combined_df.shape)
 
 
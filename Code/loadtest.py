@@ -0,0 +1,406 @@
+# loadtest.py
+"""
+Local load-testing harness for the Flask API.
+
+Starts the app under gunicorn with BigQuery, pytrends and Epidata replaced by
+in-process fakes (synthetic data, no network, no rate-limit sleeps), fires a
+configurable mix of concurrent requests at every route and reports throughput
+and p50/p95/p99 latency per route.
+
+Several gunicorn configurations can be run back to back for comparison, e.g.
+to see whether 8 threads in one worker scale like 8 single-threaded workers
+(if not, the CPU-bound pandas/sklearn work is serializing on the GIL):
+
+    python loadtest.py --configs 1x8,2x4,4x2,8x1 --concurrency 16 --duration 30
+
+Each config is WORKERSxTHREADS. The request mix is a comma-separated list of
+"METHOD /path=weight" entries (default: DEFAULT_MIX). Use --json to save the
+results for later comparison.
+
+Note: build_gtrends_flu writes CSVs to the working directory, so the server
+runs in a temporary directory (its output goes to server.log there).
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import requests
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_MIX = (
+    "GET /=1,"
+    "GET /flu=3,"
+    "GET /trends=1,"
+    "GET /preds=4,"
+    "GET /preds/summary=4,"
+    "POST /flu/upload=1,"
+    "POST /trends/update=1,"
+    "POST /preds/update=1"
+)
+
+
+# -------------------------------
+# Fake backends
+# -------------------------------
+def _hhs_region_to_states():
+    with open(os.path.join(BASE_DIR, "HHS_regions_to_states.json")) as f:
+        items = [json.loads(line) for line in f if line.strip()]
+    return {item["region_id"]: item["states"] for item in items}
+
+
+def _weeks(n_seasons=5):
+    # Sundays (CDC epiweek start) from August n_seasons years back to last week
+    end = pd.Timestamp.today().normalize()
+    start = pd.Timestamp(year=end.year - n_seasons, month=8, day=1)
+    return pd.date_range(start, end, freq="W-SUN")
+
+
+def _seasonal(weeks, region, rng):
+    # smooth winter peak + noise, peaking around late January
+    phase = 2 * np.pi * (weeks.dayofyear.values - 25) / 365.25
+    return np.clip(1.5 + 3 * np.cos(phase) + region * 0.05 + rng.normal(0, 0.3, len(weeks)), 0, None)
+
+
+def fake_combined_table(seed=0):
+    """Synthetic rows in the shape of the combined_data.combined_table view."""
+    rng = np.random.default_rng(seed)
+    weeks = _weeks()
+    frames = []
+    for region, states in _hhs_region_to_states().items():
+        wili = _seasonal(weeks, region, rng)
+        for state in states:
+            state_df = pd.DataFrame({"region": region, "week_start": weeks, "wili": wili})
+            for col in ["flu", "fever", "cough", "flu_symptoms", "sore_throat"]:
+                state_df[col] = np.clip(wili * 15 + rng.normal(0, 5, len(weeks)), 0, 100).round()
+            state_df["doordash"] = rng.integers(40, 100, len(weeks))
+            state_df["postmates"] = rng.integers(0, 30, len(weeks))
+            frames.append(state_df)
+    return pd.concat(frames, ignore_index=True)
+
+
+def fake_country_trends(seed=0):
+    """Synthetic rows in the shape of the google_trends.country_trends table."""
+    rng = np.random.default_rng(seed)
+    weeks = _weeks()
+    frames = []
+    for region, states in _hhs_region_to_states().items():
+        for state in states:
+            state_df = pd.DataFrame({"date": weeks})
+            for kw in ["flu", "fever", "cough", "flu symptoms", "sore throat", "doordash", "uber eats", "postmates"]:
+                state_df[kw] = rng.integers(0, 100, len(weeks))
+            state_df["state"] = state
+            state_df["region"] = region
+            frames.append(state_df)
+    return pd.concat(frames, ignore_index=True)
+
+
+class _Result:
+    def __init__(self, df=None):
+        self._df = df
+
+    def to_dataframe(self):
+        return self._df.copy()
+
+    def result(self):
+        return self
+
+
+class FakeBigQueryClient:
+    """Stands in for google.cloud.bigquery.Client."""
+
+    def __init__(self, project=None, **kwargs):
+        self.project = project
+
+    def query(self, query):
+        return _Result(fake_combined_table())
+
+    def get_table(self, table_ref):
+        return types.SimpleNamespace(num_rows=1, table_ref=table_ref)
+
+    def list_rows(self, table):
+        # leave out the last week so trends updates find "new" rows
+        trends = fake_country_trends()
+        return _Result(trends[trends["date"] < trends["date"].max()])
+
+    def load_table_from_dataframe(self, df, table_ref, job_config=None):
+        # the real client serializes to Parquet (holding the GIL) before uploading
+        df.to_parquet(io.BytesIO())
+        return _Result()
+
+
+class FakeTrendReq:
+    """Stands in for pytrends.request.TrendReq."""
+
+    def __init__(self, *args, **kwargs):
+        self.kw_list = []
+        self.rng = np.random.default_rng()
+
+    def build_payload(self, kw_list, timeframe=None, geo=None, **kwargs):
+        self.kw_list = list(kw_list)
+
+    def interest_over_time(self):
+        weeks = _weeks()
+        df = pd.DataFrame(
+            {kw: self.rng.integers(0, 100, len(weeks)) for kw in self.kw_list},
+            index=pd.Index(weeks, name="date"),
+        )
+        df["isPartial"] = False
+        return df
+
+
+def fake_fluview(regions, epiweeks, **kwargs):
+    """Stands in for delphi_epidata.Epidata.fluview."""
+    from epiweeks import Week
+
+    rng = np.random.default_rng(0)
+    weeks = _weeks()
+    epiweek_ids = [int(Week.fromdate(w.date()).cdcformat()) for w in weeks]
+    rows = []
+    for region in regions:
+        region_id = int(region.replace("hhs", ""))
+        wili = _seasonal(weeks, region_id, rng)
+        for ew, value in zip(epiweek_ids, wili):
+            num_patients = int(rng.integers(20000, 60000))
+            rows.append({
+                "release_date": "2025-01-01",
+                "region": region,
+                "issue": ew,
+                "epiweek": ew,
+                "lag": 0,
+                "num_ili": int(num_patients * value / 100),
+                "num_patients": num_patients,
+                "num_providers": int(rng.integers(100, 500)),
+                "wili": float(value),
+                "ili": float(value),
+            })
+    return {"result": 1, "epidata": rows, "message": "success"}
+
+
+def install_fakes():
+    """Patch the backend clients. Must run before main (or its modules) is imported."""
+    from google.cloud import bigquery
+    import pytrends.request
+    import delphi_epidata
+
+    bigquery.Client = FakeBigQueryClient
+    pytrends.request.TrendReq = FakeTrendReq
+    delphi_epidata.Epidata.fluview = staticmethod(fake_fluview)
+
+    # skip the pytrends rate-limit sleeps
+    import build_gtrends_flu
+    build_gtrends_flu.time = types.SimpleNamespace(sleep=lambda seconds: None)
+
+
+# -------------------------------
+# Server
+# -------------------------------
+def serve(port, workers, threads):
+    """Run main:app under gunicorn with fake backends in every worker."""
+    from gunicorn.app.base import BaseApplication
+
+    class FakeBackendApp(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"127.0.0.1:{port}")
+            self.cfg.set("workers", workers)
+            self.cfg.set("threads", threads)
+            self.cfg.set("timeout", 600)
+
+        def load(self):
+            sys.path.insert(0, BASE_DIR)
+            install_fakes()
+            from main import app
+            return app
+
+    FakeBackendApp().run()
+
+
+def start_server(port, workers, threads, startup_timeout=300):
+    workdir = tempfile.mkdtemp(prefix="flu_loadtest_")
+    log_path = os.path.join(workdir, "server.log")
+    print(f"Server log: {log_path}")
+    with open(log_path, "w") as log:
+        proc = subprocess.Popen(
+            [sys.executable, os.path.join(BASE_DIR, "loadtest.py"), "serve",
+             "--port", str(port), "--workers", str(workers), "--threads", str(threads)],
+            cwd=workdir, stdout=log, stderr=subprocess.STDOUT,
+        )
+    deadline = time.time() + startup_timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Server exited with code {proc.returncode}, see {log_path}")
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/", timeout=1).ok:
+                return proc
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    proc.terminate()
+    raise RuntimeError("Server did not start in time.")
+
+
+# -------------------------------
+# Load generation
+# -------------------------------
+def parse_mix(mix):
+    """Parse "METHOD /path=weight,..." into [(method, path, weight)]."""
+    routes = []
+    for entry in mix.split(","):
+        route, _, weight = entry.strip().rpartition("=")
+        method, path = route.split()
+        routes.append((method.upper(), path, float(weight)))
+    return routes
+
+
+def run_load(base_url, routes, concurrency, duration, warmup=1):
+    """
+    Send requests from `concurrency` client threads for `duration` seconds.
+
+    Returns a list of (route, status, latency_seconds) tuples and the elapsed
+    measurement time in seconds (including requests still in flight at the end).
+    """
+    labels = [f"{method} {path}" for method, path, _ in routes]
+    weights = [weight for _, _, weight in routes]
+    results = []
+    results_lock = threading.Lock()
+
+    # hit every route once so first-call costs don't land in the measurements
+    with requests.Session() as session:
+        for method, path, _ in routes:
+            for _ in range(warmup):
+                try:
+                    session.request(method, base_url + path, timeout=600)
+                except requests.RequestException as e:
+                    print(f"Warmup {method} {path} failed: {e}")
+
+    stop_at = time.perf_counter() + duration
+
+    def client(i):
+        rng = random.Random(i)
+        local = []
+        with requests.Session() as session:
+            while time.perf_counter() < stop_at:
+                idx = rng.choices(range(len(routes)), weights=weights)[0]
+                method, path, _ = routes[idx]
+                start = time.perf_counter()
+                try:
+                    status = session.request(method, base_url + path, timeout=600).status_code
+                except requests.RequestException:
+                    status = None
+                local.append((labels[idx], status, time.perf_counter() - start))
+        with results_lock:
+            results.extend(local)
+
+    # measure until the last in-flight request returns, not just until stop_at
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(client, range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return results, elapsed
+
+
+def summarize(results, elapsed):
+    """Throughput (over `elapsed` seconds) and latency percentiles (ms) per route and overall."""
+    by_route = defaultdict(list)
+    errors = defaultdict(int)
+    for route, status, latency in results:
+        by_route[route].append(latency)
+        by_route["ALL"].append(latency)
+        if status is None or status >= 400:
+            errors[route] += 1
+            errors["ALL"] += 1
+
+    rows = []
+    for route, latencies in by_route.items():
+        lat_ms = np.array(latencies) * 1000
+        p50, p95, p99 = np.percentile(lat_ms, [50, 95, 99])
+        rows.append({
+            "route": route,
+            "requests": len(lat_ms),
+            "errors": errors[route],
+            "rps": len(lat_ms) / elapsed,
+            "mean_ms": lat_ms.mean(),
+            "p50_ms": p50,
+            "p95_ms": p95,
+            "p99_ms": p99,
+        })
+    summary = pd.DataFrame(rows).assign(is_all=lambda d: d["route"] != "ALL")
+    return summary.sort_values(["is_all", "route"]).drop(columns="is_all").reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command")
+
+    serve_parser = sub.add_parser("serve", help="run the app with fake backends (used internally)")
+    serve_parser.add_argument("--port", type=int, default=8081)
+    serve_parser.add_argument("--workers", type=int, default=1)
+    serve_parser.add_argument("--threads", type=int, default=8)
+
+    parser.add_argument("--configs", default="1x8",
+                        help="comma-separated WORKERSxTHREADS gunicorn configs (Default: 1x8, as deployed)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="weighted request mix")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent client threads")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of load per config")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--url", help="test an already running server instead of starting one")
+    parser.add_argument("--json", help="write results for all configs to this file")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args.port, args.workers, args.threads)
+        return
+
+    routes = parse_mix(args.mix)
+    configs = ["external"] if args.url else args.configs.split(",")
+    all_results = []
+
+    for config in configs:
+        proc = None
+        if args.url:
+            base_url = args.url.rstrip("/")
+        else:
+            workers, threads = (int(x) for x in config.lower().split("x"))
+            print(f"=== {workers} worker(s) x {threads} thread(s) ===")
+            proc = start_server(args.port, workers, threads)
+            base_url = f"http://127.0.0.1:{args.port}"
+
+        try:
+            results, elapsed = run_load(base_url, routes, args.concurrency, args.duration)
+        finally:
+            if proc is not None:
+                proc.terminate()
+                proc.wait()
+
+        summary = summarize(results, elapsed)
+        summary.insert(0, "config", config)
+        print(f"Measured {len(results)} requests over {elapsed:.1f} s")
+        print(summary.to_string(index=False, float_format=lambda x: f"{x:.1f}"))
+        print()
+        all_results.append(summary)
+
+    combined = pd.concat(all_results, ignore_index=True)
+    if len(configs) > 1:
+        print("=== Comparison (all routes) ===")
+        print(combined[combined["route"] == "ALL"].to_string(index=False, float_format=lambda x: f"{x:.1f}"))
+
+    if args.json:
+        combined.to_json(args.json, orient="records", indent=2)
+        print(f"Saved results to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
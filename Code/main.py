@@ -6,7 +6,12 @@ import logging
 from flu_api import fetch_fluview_hhs, clean_fluview_data
 from build_gtrends_flu import main as build_gtrends_flu
 from bigquery_utils import upload_to_bigquery
-from predict import get_preds
+from profiling import init_profiling, profile_job, PROFILE_JOBS
+
+# predict runs the whole pipeline (BigQuery load, merges, model fits) on import;
+# set PROFILE_JOBS=1 to capture a profile of it
+with profile_job("predict_pipeline", force=PROFILE_JOBS):
+    from predict import get_preds, get_summary
 
 
 # Flask app
@@ -14,6 +19,7 @@ app = Flask(__name__)
 CORS(app)  # so Power BI / browser clients can call it
 logging.basicConfig(level=logging.INFO)
 logger = app.logger
+init_profiling(app)  # no-op unless PROFILE_ADMIN_TOKEN / PROFILE_SAMPLE_RATE are set
 
 PROJECT_ID = "flu-project-473220" 
 DATASET_ID = 'flu_data'       
@@ -103,6 +109,19 @@ def preds_preview():
         logger.exception("Error generating predictions")
         return jsonify({"error": str(e)}), 500
 
+@app.get("/preds/summary")
+def preds_summary():
+    """Return pre-aggregated MAE/RMSE/R² tables by season, region and week."""
+    try:
+        # NaN (e.g. r2 for groups with constant actuals) is not valid JSON → null
+        return jsonify({
+            table_name: summary_df.astype(object).where(summary_df.notna(), None).to_dict(orient="records")
+            for table_name, summary_df in get_summary().items()
+        })
+    except Exception as e:
+        logger.exception("Error generating prediction summaries")
+        return jsonify({"error": str(e)}), 500
+
 @app.post("/preds/update")
 def preds_update():
     """Run the Lasso prediction pipeline and upload predictions to BigQuery."""
@@ -125,10 +144,21 @@ def preds_update():
             table_id="coefficients_table"
         )
 
+        # Upload accuracy summaries next to the row-level tables
+        summary_tables = get_summary()
+        for table_name, summary_df in summary_tables.items():
+            upload_to_bigquery(
+                summary_df,
+                project_id=PROJECT_ID,
+                dataset_id="predictions",
+                table_id=f"{table_name}_table"
+            )
+
         return jsonify({
             "status": "success",
             "pred_rows": len(predictions_df),
-            "coef_rows": len(coefficients_df)
+            "coef_rows": len(coefficients_df),
+            "summary_rows": {name: len(df) for name, df in summary_tables.items()}
         })
     except Exception as e:
         logger.exception("Error uploading predictions to BigQuery")
@@ -1,9 +1,12 @@
+import os
+
 import numpy as np
 import pandas as pd
 
 import predict_utils
 from bigquery_utils import load_view_from_bigquery
-from predict_utils import compute_averages_per_region, assign_flu_season, train_test_split, format_predictions_df
+from predict_utils import compute_averages_per_region, assign_flu_season, train_test_split, format_predictions_df, summarize_predictions
+from predict_utils import bootstrap_prediction_intervals
 from sklearn.linear_model import LinearRegression
 from sklearn.metrics import mean_squared_error, r2_score
 from sklearn.preprocessing import StandardScaler
@@ -66,6 +69,12 @@ min_season = combined_table["season"].min() + 1
 max_season = combined_table["season"].max()
 cutoff_seasons = range(min_season, max_season + 1)
 
+# bootstrap prediction intervals (replicates per model, block length in weeks)
+N_BOOTSTRAP     = int(os.environ.get("N_BOOTSTRAP", "500"))
+BOOTSTRAP_SEED  = int(os.environ.get("BOOTSTRAP_SEED", "0"))
+BOOTSTRAP_BLOCK = int(os.environ.get("BOOTSTRAP_BLOCK_WEEKS", "4"))
+INTERVAL_ALPHA  = float(os.environ.get("INTERVAL_ALPHA", "0.1"))   # 0.1 → 90% interval
+
 predictions_list = []
 coef_list = []
 
@@ -96,6 +105,14 @@ for cutoff in cutoff_seasons:
 
         lag_rule_label = "+".join([f"lag{l}" for l in sorted(lags_in_rule)])
 
+        # bootstrap prediction interval (all replicates solved in one batch)
+        pred_lower, pred_upper = bootstrap_prediction_intervals(
+            train[feature_cols].values, train[target_col].values, train["week_start"].values,
+            test[feature_cols].values,
+            n_boot=N_BOOTSTRAP, alpha=INTERVAL_ALPHA,
+            block_weeks=BOOTSTRAP_BLOCK, seed=BOOTSTRAP_SEED
+        )
+
         # store predictions (row-level)
         df_preds = pd.DataFrame({
             "week_start":    test["week_start"].values,
@@ -104,6 +121,8 @@ for cutoff in cutoff_seasons:
             "lag_rule":      lag_rule_label,
             "actual":        test[target_col].values,
             "predicted":     preds,
+            "pred_lower":    pred_lower,
+            "pred_upper":    pred_upper,
             "abs_error":     abs_error,
             "sq_error":      sq_error,
             "r2_model":      r2       # same for all rows in this model
@@ -131,6 +150,12 @@ coefficients_df = coefficients_df.sort_values(
     ascending=[True, True, False]
 )
 
+# accuracy summaries (computed once, served from /preds/summary)
+summary_tables = summarize_predictions(predictions_df)
+
 def get_preds():
     return format_predictions_df(predictions_df), format_predictions_df(coefficients_df)
 
+def get_summary():
+    return summary_tables
+
@@ -1,3 +1,6 @@
+import numpy as np
+
+
 def compute_averages_per_region(combined_table, trend_cols):
     region_avgs = (
         combined_table
@@ -51,11 +54,127 @@ def format_predictions_df(predictions_df):
     return predictions_df
 
 
-
-
-
-
-
-
-
-
+SUMMARY_GROUPINGS = {
+    "summary_by_season": ["season_cutoff", "lag_rule"],
+    "summary_by_region": ["region", "lag_rule"],
+    "summary_by_week":   ["week_start", "lag_rule"],
+}
+
+def summarize_predictions(predictions_df):
+    """
+    Compute MAE / RMSE / R² tables from row-level predictions.
+
+    Each grouping is a grouped mean of `actual` (for the squared deviations) followed
+    by a single grouped sum over (n, abs_error, sq_error, sq_dev); the metrics are
+    then derived from those sums, with R² = 1 - SSE / SST and SST = Σ(actual - mean)².
+    R² is NaN for groups with constant actuals (SST = 0).
+
+    Returns
+    -------
+    dict[str, pd.DataFrame]
+        One table per entry in SUMMARY_GROUPINGS, keyed by table name.
+    """
+    sum_cols = ["n", "abs_error", "sq_error", "sq_dev"]
+
+    summaries = {}
+    for table_name, keys in SUMMARY_GROUPINGS.items():
+        group_mean = predictions_df.groupby(keys)["actual"].transform("mean")
+        sums = predictions_df.assign(sq_dev=(predictions_df["actual"] - group_mean) ** 2, n=1)
+        agg = sums.groupby(keys, as_index=False)[sum_cols].sum()
+
+        sst = agg["sq_dev"]
+        summary = agg[keys + ["n"]].copy()
+        summary["mae"]  = agg["abs_error"] / agg["n"]
+        summary["rmse"] = np.sqrt(agg["sq_error"] / agg["n"])
+        summary["r2"]   = 1 - agg["sq_error"] / sst.where(sst > 0)
+        summaries[table_name] = format_predictions_df(summary)
+
+    return summaries
+
+
+def bootstrap_prediction_intervals(X_train, y_train, train_weeks, X_test,
+                                   n_boot=500, alpha=0.1, block_weeks=4, seed=0,
+                                   chunk_rows=4096):
+    """
+    Block-bootstrap prediction intervals for an OLS model.
+
+    Whole blocks of consecutive training weeks (all regions in those weeks) are
+    resampled with replacement. A resample is represented by how many times each
+    week was drawn; with X'X and X'y summed per week, the B normal equations
+    X_b'X_b β_b = X_b'y_b are built with two matrix products over all replicates
+    at once and solved as one batched np.linalg.solve. This runs on a single
+    core; most of the time goes to the per-week sums and the final quantiles.
+    Each replicate's test predictions get a resampled training residual added,
+    so the quantiles cover model and noise uncertainty.
+
+    Parameters
+    ----------
+    X_train, X_test : np.ndarray
+        Feature matrices (without intercept column).
+    y_train : np.ndarray
+        Training target.
+    train_weeks : array-like
+        Week of each training row, used to form the blocks.
+    n_boot : int
+        Number of bootstrap replicates.
+    alpha : float
+        Interval miscoverage, e.g. 0.1 for a 90% interval.
+    block_weeks : int
+        Number of consecutive weeks per resampled block.
+    seed : int
+        Random seed.
+    chunk_rows : int
+        Training rows per chunk when summing X'X by week.
+
+    Returns
+    -------
+    (np.ndarray, np.ndarray)
+        Lower and upper interval bounds for each test row.
+    """
+    if n_boot < 1:
+        raise ValueError(f"n_boot must be at least 1, got {n_boot}")
+
+    rng = np.random.default_rng(seed)
+    X_train = np.column_stack([np.ones(len(X_train)), np.asarray(X_train, dtype=float)])
+    X_test  = np.column_stack([np.ones(len(X_test)), np.asarray(X_test, dtype=float)])
+    y_train = np.asarray(y_train, dtype=float)
+    n, p = X_train.shape
+
+    # map each training row to its week index
+    week_values, row_week = np.unique(np.asarray(train_weeks), return_inverse=True)
+    n_weeks = len(week_values)
+    block_weeks = max(1, min(block_weeks, n_weeks))
+
+    # draw block starts and count how often each week is picked per replicate
+    n_blocks = -(-n_weeks // block_weeks)
+    starts = rng.integers(0, n_weeks - block_weeks + 1, size=(n_boot, n_blocks))
+    picked = (starts[:, :, None] + np.arange(block_weeks)).reshape(n_boot, -1)[:, :n_weeks]
+    offsets = np.arange(n_boot)[:, None] * n_weeks
+    week_counts = np.bincount((picked + offsets).ravel(), minlength=n_boot * n_weeks)
+    week_counts = week_counts.reshape(n_boot, n_weeks).astype(float)               # (B, W)
+
+    # per-week sums of X'X and X'y, so replicates only need week-level weights
+    # (outer products are built in row chunks to bound transient memory)
+    xtx_w = np.zeros((n_weeks, p, p))
+    for i in range(0, n, chunk_rows):
+        X_chunk = X_train[i:i + chunk_rows]
+        np.add.at(xtx_w, row_week[i:i + chunk_rows], X_chunk[:, :, None] * X_chunk[:, None, :])
+    xty_w = np.zeros((n_weeks, p))
+    np.add.at(xty_w, row_week, X_train * y_train[:, None])
+
+    # batched normal equations: X'WX and X'Wy for every replicate
+    xtx = (week_counts @ xtx_w.reshape(n_weeks, p * p)).reshape(n_boot, p, p)
+    xty = week_counts @ xty_w
+    try:
+        beta = np.linalg.solve(xtx, xty[:, :, None])[:, :, 0]                       # (B, p)
+    except np.linalg.LinAlgError:
+        beta = (np.linalg.pinv(xtx) @ xty[:, :, None])[:, :, 0]
+
+    # residuals of the full-sample fit, resampled as prediction noise
+    beta_full = np.linalg.lstsq(X_train, y_train, rcond=None)[0]
+    residuals = y_train - X_train @ beta_full
+    noise = residuals[rng.integers(0, n, size=(n_boot, len(X_test)))]
+
+    boot_preds = beta @ X_test.T + noise                                            # (B, n_test)
+    lower, upper = np.quantile(boot_preds, [alpha / 2, 1 - alpha / 2], axis=0)
+    return lower, upper
@@ -0,0 +1,287 @@
+# profiling.py
+"""
+Opt-in CPU and memory profiling for Flask requests and background jobs.
+
+Profiling is configured through environment variables. Request profiling is
+completely disabled unless PROFILE_ADMIN_TOKEN or PROFILE_SAMPLE_RATE is set;
+when disabled, no request hooks are registered, so the app runs unchanged.
+Jobs are profiled when PROFILE_JOBS is set or they are picked by the sample rate.
+
+    PROFILE_ADMIN_TOKEN   Token required to trigger a profile on demand and to
+                          list/download stored profiles.
+    PROFILE_SAMPLE_RATE   Fraction of requests (0-1) to profile automatically.
+    PROFILE_DIR           Where profiles are written (Default: /tmp/profiles).
+    PROFILE_MAX_FILES     Profile files kept in PROFILE_DIR; the oldest are
+                          deleted first (Default: 100).
+    PROFILE_BUCKET        GCS bucket to upload profiles to, under profiles/.
+                          When set, local copies are removed after upload and
+                          /profiles lists and serves from the bucket, so any
+                          instance can return any profile. Use a bucket
+                          lifecycle rule to expire old profiles.
+    PROFILE_TOP_ALLOCS    Number of allocation sites kept in the memory summary.
+    PROFILE_JOBS          Set to 1 to profile background jobs (the prediction
+                          pipeline, the Google Trends builder) on every run.
+
+A request is profiled on demand when it carries the admin token in the
+X-Profile-Token header (or ?profile_token=...) together with either the
+X-Profile: 1 header or the ?profile=1 query flag.
+
+Each profile is stored as two files sharing a base name:
+    <name>.prof   cProfile/pstats dump (open with pstats, snakeviz, gprof2dot)
+    <name>.txt    tracemalloc summary (peak memory + top allocation sites)
+
+cProfile only records the thread that started the profile, but tracemalloc
+traces every thread in the process. With gunicorn --threads > 1, a profile's
+memory figures include concurrent requests (which also pay the tracing cost
+while it runs); they are only reliable with --threads 1.
+"""
+
+import cProfile
+import hmac
+import io
+import logging
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from flask import Response, abort, g, jsonify, request, send_from_directory
+
+logger = logging.getLogger(__name__)
+
+ADMIN_TOKEN = os.environ.get("PROFILE_ADMIN_TOKEN", "")
+SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "/tmp/profiles")
+TOP_ALLOCS = int(os.environ.get("PROFILE_TOP_ALLOCS", "25"))
+PROFILE_JOBS = os.environ.get("PROFILE_JOBS", "").lower() in ("1", "true", "yes")
+MAX_FILES = int(os.environ.get("PROFILE_MAX_FILES", "100"))
+BUCKET = os.environ.get("PROFILE_BUCKET", "")
+BUCKET_PREFIX = "profiles/"
+
+# Only one cProfile profiler can be active per process and tracemalloc is global
+# (it traces every thread), so only one profile runs at a time. Requests arriving
+# while a profile is active are served unprofiled.
+_profile_lock = threading.Lock()
+
+_SAFE_NAME = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+def profiling_enabled() -> bool:
+    """True when profiling has been configured for this process."""
+    return bool(ADMIN_TOKEN) or SAMPLE_RATE > 0
+
+
+def _token_ok(token) -> bool:
+    return bool(ADMIN_TOKEN) and bool(token) and hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+class _Profile:
+    """A single cProfile + tracemalloc capture."""
+
+    def __init__(self, label: str):
+        stamp = time.strftime("%Y%m%dT%H%M%S")
+        self.name = f"{stamp}_{_SAFE_NAME.sub('_', label).strip('_')}_{os.getpid()}_{threading.get_ident()}"
+        self.profiler = cProfile.Profile()
+
+    def start(self):
+        tracemalloc.start()
+        self.started = time.perf_counter()
+        self.profiler.enable()
+
+    def stop(self) -> str:
+        """Stop profiling, write the profile files and return their base name."""
+        self.profiler.disable()
+        elapsed = time.perf_counter() - self.started
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        base = os.path.join(PROFILE_DIR, self.name)
+        self.profiler.dump_stats(base + ".prof")
+
+        out = io.StringIO()
+        out.write(f"profile: {self.name}\n")
+        out.write(f"wall time: {elapsed:.3f} s\n")
+        out.write(f"thread: {threading.get_ident()} (CPU profile covers this thread only)\n")
+        out.write("memory: whole process, all threads (only per-request with --threads 1)\n")
+        out.write(f"traced memory: current {current / 1e6:.2f} MB, peak {peak / 1e6:.2f} MB\n\n")
+        out.write(f"top {TOP_ALLOCS} allocation sites (all threads):\n")
+        for stat in snapshot.statistics("lineno")[:TOP_ALLOCS]:
+            out.write(f"{stat}\n")
+        out.write("\ncumulative CPU time:\n")
+        pstats.Stats(self.profiler, stream=out).sort_stats("cumulative").print_stats(40)
+        with open(base + ".txt", "w") as f:
+            f.write(out.getvalue())
+
+        _prune_local()
+        if BUCKET:
+            _upload(self.name)
+
+        logger.info("Saved profile %s (%.3f s)", self.name, elapsed)
+        return self.name
+
+
+def _prune_local():
+    """Delete the oldest profile files beyond MAX_FILES."""
+    paths = [os.path.join(PROFILE_DIR, f) for f in os.listdir(PROFILE_DIR) if f.endswith((".prof", ".txt"))]
+    paths.sort(key=os.path.getmtime)
+    for path in paths[:max(0, len(paths) - MAX_FILES)]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+_bucket = None
+
+def _get_bucket():
+    global _bucket
+    if _bucket is None:
+        from google.cloud import storage
+        _bucket = storage.Client().bucket(BUCKET)
+    return _bucket
+
+
+def _upload(name):
+    """Upload a profile to PROFILE_BUCKET and drop the local copies."""
+    for ext in (".prof", ".txt"):
+        path = os.path.join(PROFILE_DIR, name + ext)
+        try:
+            _get_bucket().blob(BUCKET_PREFIX + name + ext).upload_from_filename(path)
+            os.remove(path)
+        except Exception:
+            logger.exception("Error uploading profile %s to gs://%s", name + ext, BUCKET)
+
+
+@contextmanager
+def profile_job(label: str, force: bool = False):
+    """
+    Profile a block of code, e.g. a background job.
+
+    Parameters
+    ----------
+    label : str
+        Included in the profile file name.
+    force : bool
+        Profile regardless of PROFILE_SAMPLE_RATE, e.g. force=PROFILE_JOBS.
+
+    Yields the profile name, or None if the block is not being profiled.
+    """
+    if not (force or random.random() < SAMPLE_RATE):
+        yield None
+        return
+    if not _profile_lock.acquire(blocking=False):
+        yield None
+        return
+
+    prof = _Profile(label)
+    try:
+        prof.start()
+        yield prof.name
+    finally:
+        try:
+            prof.stop()
+        finally:
+            _profile_lock.release()
+
+
+def _requested(req) -> bool:
+    flag = req.headers.get("X-Profile") or req.args.get("profile")
+    if flag not in ("1", "true", "yes"):
+        return False
+    token = req.headers.get("X-Profile-Token") or req.args.get("profile_token")
+    return _token_ok(token)
+
+
+def _start_request_profile():
+    if not (_requested(request) or random.random() < SAMPLE_RATE):
+        return
+    if not _profile_lock.acquire(blocking=False):
+        logger.info("Profiler busy, serving %s unprofiled", request.path)
+        return
+    g._profile = _Profile(f"{request.method}_{request.path}")
+    g._profile.start()
+
+
+def _stop_request_profile(response):
+    prof = g.pop("_profile", None)
+    if prof is None:
+        return response
+    try:
+        name = prof.stop()
+        response.headers["X-Profile-Name"] = name
+    except Exception:
+        logger.exception("Error saving request profile")
+    finally:
+        _profile_lock.release()
+    return response
+
+
+def _teardown_request_profile(exc):
+    # before_request succeeded but the response was never produced
+    prof = g.pop("_profile", None)
+    if prof is not None:
+        prof.profiler.disable()
+        tracemalloc.stop()
+        _profile_lock.release()
+
+
+def _require_admin():
+    token = request.headers.get("X-Profile-Token") or request.args.get("profile_token")
+    if not _token_ok(token):
+        abort(403)
+
+
+def list_profiles():
+    """List stored profiles (admin token required)."""
+    _require_admin()
+    if BUCKET:
+        files = [blob.name[len(BUCKET_PREFIX):] for blob in _get_bucket().list_blobs(prefix=BUCKET_PREFIX)]
+    elif os.path.isdir(PROFILE_DIR):
+        files = os.listdir(PROFILE_DIR)
+    else:
+        files = []
+    return jsonify(sorted((f for f in files if f.endswith((".prof", ".txt"))), reverse=True))
+
+
+def download_profile(filename):
+    """Download a stored profile file (admin token required)."""
+    _require_admin()
+    if not filename.endswith((".prof", ".txt")):
+        abort(404)
+    if BUCKET:
+        blob = _get_bucket().blob(BUCKET_PREFIX + filename)
+        if "/" in filename or not blob.exists():
+            abort(404)
+        return Response(
+            blob.download_as_bytes(),
+            mimetype="text/plain" if filename.endswith(".txt") else "application/octet-stream",
+            headers={"Content-Disposition": f"attachment; filename={filename}"},
+        )
+    return send_from_directory(PROFILE_DIR, filename, as_attachment=True)
+
+
+def init_profiling(app):
+    """
+    Register profiling hooks and download endpoints on a Flask app.
+
+    Does nothing unless profiling is enabled, so there is no per-request
+    overhead when it is off.
+    """
+    if not profiling_enabled():
+        return
+
+    app.before_request(_start_request_profile)
+    app.after_request(_stop_request_profile)
+    app.teardown_request(_teardown_request_profile)
+
+    if ADMIN_TOKEN:
+        app.add_url_rule("/profiles", "list_profiles", list_profiles, methods=["GET"])
+        app.add_url_rule("/profiles/<path:filename>", "download_profile", download_profile, methods=["GET"])
+
+    logger.info("Profiling enabled (sample rate %.3f, dir %s)", SAMPLE_RATE, PROFILE_DIR)